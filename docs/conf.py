@@ -21,11 +21,21 @@ extensions = [
     "sphinx.ext.intersphinx",
     "sphinx.ext.autodoc",
     "sphinx.ext.autosummary",
-    "numpydoc",
+    "sphinx.ext.napoleon",
 ]
 
+# napoleon is much lighter than numpydoc, we only use numpy-style docstrings
+napoleon_numpy_docstring = True
+napoleon_google_docstring = False
+napoleon_use_rtype = False
+
 templates_path = []
-exclude_patterns = []
+exclude_patterns = ["build", "Thumbs.db", ".DS_Store"]
+
+# do not copy docstrings from base classes, traitlets' are large and slow to parse
+autodoc_inherit_docstrings = False
+# reuse previously generated autosummary stubs across builds
+autosummary_generate_overwrite = False
 
 # have all links automatically associated with the right domain.
 default_role = "py:obj"
@@ -48,6 +58,3 @@ html_theme_options = {
 # so a file named "default.css" will overwrite the builtin "default.css".
 html_static_path = ["_static"]
 html_logo = "_static/cta.png"
-
-# fixes "no sub file found" for members inherited from traitlets
-numpydoc_class_members_toctree = False
@@ -1,5 +1,4 @@
 """EventSource implementations for protozfits files."""
-from .dl0 import ProtozfitsDL0EventSource, ProtozfitsDL0TelescopeEventSource
 from .version import __version__
 
 __all__ = [
@@ -7,3 +6,12 @@ __all__ = [
     "ProtozfitsDL0EventSource",
     "ProtozfitsDL0TelescopeEventSource",
 ]
+
+
+def __getattr__(name):
+    """Import the event sources lazily, dl0 pulls in ctapipe and protozfits."""
+    if name in ("ProtozfitsDL0EventSource", "ProtozfitsDL0TelescopeEventSource"):
+        from . import dl0
+
+        return getattr(dl0, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,8 @@
+import hashlib
 from contextlib import ExitStack
 from datetime import timedelta, timezone
+from queue import Queue
+from threading import Thread
 from zoneinfo import ZoneInfo
 
 import astropy.units as u
@@ -29,23 +32,60 @@ ANY_ARRAY_TYPE_TO_NUMPY_TYPE = {
 
 DTYPE_TO_ANYARRAY_TYPE = {v: k for k, v in ANY_ARRAY_TYPE_TO_NUMPY_TYPE.items()}
 
+# flat list indexed by np.dtype.num, avoids hashing the dtype on every call
+_n_dtypes = max(np.dtype(t).num for t in DTYPE_TO_ANYARRAY_TYPE) + 1
+_ANYARRAY_TYPE_BY_NUM = [None] * _n_dtypes
+for _dtype, _type in DTYPE_TO_ANYARRAY_TYPE.items():
+    _ANYARRAY_TYPE_BY_NUM[np.dtype(_dtype).num] = _type
+
 acada_user = "ctao-acada-n"
 obs_start = Time("2023-08-02T02:15:31")
 timezone_cta_n = ZoneInfo("Atlantic/Canary")
 
+# converted once, Time.to_datetime goes through ERFA and is needed by
+# several fixtures
+obs_start_dt_utc = obs_start.to_datetime(timezone.utc)
+obs_start_path_string = f"{obs_start_dt_utc:%Y%m%dT%H%M%S}"
+
+# parameters of the dummy DL0 data written by the ``dummy_dl0`` fixture,
+# also used to build the cache key for reusing the files between test runs
+subarray_id = 1
+sb_id = 123
+obs_id = 456
+sdh_ids = (1, 2, 3, 4)
+n_events = 100
+chunksize = 10
+waveform_scale = 80.0
+waveform_offset = 5.0
+# all-zero waveforms for now, see the TODO in ``dummy_dl0``
+waveform_fill = 0.0
+# identified as signal, low gain stored, high gain stored
+pixel_status_value = 0b00001101
+
+# blocks must hold a full tile's capacity, so match rows_per_tile to the
+# 10 events a chunk actually holds (~1.5 MB of waveforms) and use 2 MB
+# blocks, the range where compressors do best anyway.
+# n_compression_threads=0 compresses in the calling thread, the per-SDH
+# writer threads already provide the parallelism without oversubscribing.
+proto_kwargs = dict(
+    n_tiles=10,
+    rows_per_tile=10,
+    compression_block_size_kb=2 * 1024,
+    n_compression_threads=0,
+)
+
 
 def to_anyarray(array):
     """Convert numpy to protobuf AnyArray."""
-    type_ = DTYPE_TO_ANYARRAY_TYPE[array.dtype.type]
-    return AnyArray(type=type_, data=array.tobytes())
+    return AnyArray(type=_ANYARRAY_TYPE_BY_NUM[array.dtype.num], data=array.tobytes())
 
 
-def evening_of_obs(time, tz):
+def evening_of_obs(dt_utc, tz):
     """Get the evening an observation started.
 
     Uses noon localtime in ``tz`` as a cutoff.
     """
-    dt = time.to_datetime(timezone.utc).astimezone(tz)
+    dt = dt_utc.astimezone(tz)
     if dt.hour < 12:
         return (dt - timedelta(days=1)).date()
 
@@ -54,8 +94,36 @@ def evening_of_obs(time, tz):
 
 @pytest.fixture(scope="session")
 def acada_base(tmp_path_factory):
-    """Base directory of acada data."""
-    return tmp_path_factory.mktemp("acada_base_")
+    """Base directory of acada data.
+
+    Lives outside the per-session tmp_path, keyed by the dummy data
+    parameters, so that the expensive ``dummy_dl0`` files are reused
+    by subsequent pytest runs instead of being regenerated.
+    """
+    # every parameter that determines the file contents must be part of the
+    # key, or edits to the fixture would silently serve stale cached files
+    cache_key = hashlib.sha1(
+        repr(
+            (
+                subarray_id,
+                sb_id,
+                obs_id,
+                obs_start.isot,
+                timezone_cta_n.key,
+                sdh_ids,
+                chunksize,
+                n_events,
+                waveform_scale,
+                waveform_offset,
+                waveform_fill,
+                pixel_status_value,
+                sorted(proto_kwargs.items()),
+            )
+        ).encode()
+    ).hexdigest()[:12]
+    base = tmp_path_factory.getbasetemp().parent / "ctapipe_io_zfits_cache" / cache_key
+    base.mkdir(parents=True, exist_ok=True)
+    return base
 
 
 @pytest.fixture(scope="session")
@@ -65,7 +133,6 @@ def dl0_base(acada_base):
     See Table 6 of the ACADA-DPPS ICD.
     """
     dl0 = acada_base / "DL0"
-    dl0.mkdir(exist_ok=True)
 
     lst_base = dl0 / "TEL001" / acada_user / "acada-adh"
     lst_events = lst_base / "events"
@@ -73,11 +140,12 @@ def dl0_base(acada_base):
     array_triggers = dl0 / "array" / acada_user / "acada-adh" / "triggers"
     array_monitoring = dl0 / "array" / acada_user / "acada-adh" / "monitoring"
 
-    evening = evening_of_obs(obs_start, timezone_cta_n)
+    evening = evening_of_obs(obs_start_dt_utc, timezone_cta_n)
+    evening_path = f"{evening:%Y/%m/%d}"
 
+    # creating the leaves with parents=True covers all ancestors, including dl0
     for directory in (lst_events, lst_monitoring, array_triggers, array_monitoring):
-        date_path = directory / f"{evening:%Y/%m/%d}"
-        date_path.mkdir(exist_ok=True, parents=True)
+        (directory / evening_path).mkdir(exist_ok=True, parents=True)
 
     return dl0
 
@@ -86,18 +154,27 @@ def dl0_base(acada_base):
 def dummy_dl0(dl0_base):
     trigger_dir = dl0_base / "array" / acada_user / "acada-adh/triggers/2023/08/01/"
     lst_event_dir = dl0_base / "TEL001" / acada_user / "acada-adh/events/2023/08/01/"
-    subarray_id = 1
-    sb_id = 123
-    obs_id = 456
     sb_creator_id = 1
-    sdh_ids = (1, 2, 3, 4)
 
-    obs_start_path_string = f"{obs_start.to_datetime(timezone.utc):%Y%m%dT%H%M%S}"
     filename = f"SUB{subarray_id:03d}_SWAT001_{obs_start_path_string}_SBID{sb_id:019d}_OBSID{obs_id:019d}_SUBARRAY_CHUNK000.fits.fz"  # noqa
-    # sdh_id and chunk_id will be filled later -> double {{}}
-    lst_event_pattern = f"TEL001_SDH{{sdh_id:03d}}_{obs_start_path_string}_SBID{sb_id:019d}_OBSID{obs_id:019d}_TEL_SHOWER_CHUNK{{chunk_id:03d}}.fits.fz"  # noqa
+    # sdh_id and chunk_id are filled per file, %-formatting is cheaper
+    # than str.format in the rollover path
+    lst_event_pattern = f"TEL001_SDH%03d_{obs_start_path_string}_SBID{sb_id:019d}_OBSID{obs_id:019d}_TEL_SHOWER_CHUNK%03d.fits.fz"  # noqa
     trigger_path = trigger_dir / filename
 
+    # the acada_base fixture is cached between test runs, skip regeneration.
+    # the marker is only written once generation finished, checking for the
+    # output files themselves would happily reuse truncated files left
+    # behind by an interrupted run
+    done_marker = dl0_base.parent / "dummy_dl0_complete"
+    if done_marker.exists():
+        return trigger_path
+
+    # clean up partial files of a previously interrupted generation
+    trigger_path.unlink(missing_ok=True)
+    for stale in lst_event_dir.glob("TEL001_SDH*.fits.fz"):
+        stale.unlink()
+
     # subarray_data_stream = DL0_Subarray.DataStream(
     #     subarray_id=subarray_id,
     #     sb_id=sb_id,
@@ -110,8 +187,8 @@ def dummy_dl0(dl0_base):
         tel_id=1,
         sb_id=sb_id,
         obs_id=obs_id,
-        waveform_scale=80.0,
-        waveform_offset=5.0,
+        waveform_scale=waveform_scale,
+        waveform_offset=waveform_offset,
         sb_creator_id=sb_creator_id,
     )
     camera_configuration = DL0_Telescope.CameraConfiguration(
@@ -119,8 +196,9 @@ def dummy_dl0(dl0_base):
         local_run_id=789,
         config_time_s=obs_start.unix,
         camera_config_id=47,
-        pixel_id_map=to_anyarray(np.arange(1855)),
-        module_id_map=to_anyarray(np.arange(265)),
+        # uint16 covers the id ranges and quarters the wire size vs int64
+        pixel_id_map=to_anyarray(np.arange(1855, dtype=np.uint16)),
+        module_id_map=to_anyarray(np.arange(265, dtype=np.uint16)),
         num_pixels=1855,
         num_channels=2,
         num_samples_nominal=40,
@@ -129,41 +207,89 @@ def dummy_dl0(dl0_base):
         sampling_frequency=1024,
     )
 
-    time = obs_start
+    # compute all event timestamps at once, scalar Time arithmetic is slow
+    times = obs_start + np.arange(n_events) * (0.001 * u.s)
+    times_s, times_qns = time_to_cta_high_res(times)
 
     ctx = ExitStack()
-    proto_kwargs = dict(
-        n_tiles=5, rows_per_tile=20, compression_block_size_kb=64 * 1024
-    )
-
-    chunksize = 10
-    events_written = {sdh_id: 0 for sdh_id in sdh_ids}
-    current_chunk = {sdh_id: -1 for sdh_id in sdh_ids}
-    lst_event_files = {}
-
-    def open_next_event_file(sdh_id):
-        if sdh_id in lst_event_files:
-            lst_event_files[sdh_id].close()
-
-        current_chunk[sdh_id] += 1
-        chunk_id = current_chunk[sdh_id]
-        path = lst_event_dir / lst_event_pattern.format(
-            sdh_id=sdh_id, chunk_id=chunk_id
-        )
-        f = ctx.enter_context(ProtobufZOFits(**proto_kwargs))
-        f.open(str(path))
-        f.move_to_new_table("DataStream")
-        f.write_message(lst_data_stream)
-        f.move_to_new_table("CameraConfiguration")
-        f.write_message(camera_configuration)
-        f.move_to_new_table("Events")
-        lst_event_files[sdh_id] = f
-        events_written[sdh_id] = 0
+    # exceptions in the writer threads end up here and are re-raised below,
+    # a died thread must not let the fixture succeed with truncated files
+    write_errors = []
+
+    def write_sdh_events(sdh_id, queue):
+        """Write all events of one SDH, rotating chunks, in its own thread.
+
+        Each SDH file is owned by exactly one thread, so the writers
+        compress in parallel without any locking.
+        """
+        current_chunk = -1
+        events_written = 0
+        f = None
+
+        def open_next_event_file():
+            nonlocal f, current_chunk, events_written
+            if f is not None:
+                f.close()
+
+            current_chunk += 1
+            path = lst_event_dir / (lst_event_pattern % (sdh_id, current_chunk))
+            f = ProtobufZOFits(**proto_kwargs)
+            f.open(str(path))
+            f.move_to_new_table("DataStream")
+            f.write_message(lst_data_stream)
+            f.move_to_new_table("CameraConfiguration")
+            f.write_message(camera_configuration)
+            f.move_to_new_table("Events")
+            events_written = 0
+
+        try:
+            open_next_event_file()
+            while (event := queue.get()) is not None:
+                f.write_message(event)
+                events_written += 1
+                if events_written >= chunksize:
+                    open_next_event_file()
+        except Exception as e:
+            write_errors.append(e)
+        finally:
+            if f is not None:
+                f.close()
 
     def convert_waveform(waveform):
         scale = lst_data_stream.waveform_scale
         offset = lst_data_stream.waveform_offset
-        return ((waveform + offset) * scale).astype(np.uint16)
+        # in-place ops avoid the intermediate arrays of (waveform + offset) * scale
+        np.add(waveform, offset, out=waveform)
+        np.multiply(waveform, scale, out=waveform)
+        return waveform.astype(np.uint16)
+
+    # loop invariants, all events share these
+    # TODO: fill actual signal into waveform, not just 0
+    waveform = to_anyarray(
+        convert_waveform(np.full((1, 1855, 40), waveform_fill, dtype=np.float32))
+    )
+    pixel_status = to_anyarray(np.full(1855, pixel_status_value, dtype=np.uint8))
+    tel_ids = to_anyarray(np.array([1]))
+    # reused buffer for the only per-event array, filled in-place in the loop
+    trigger_id = np.empty(1, dtype=np.int64)
+
+    # prototype messages, mutated per event to skip the slow protobuf
+    # keyword constructors in the loop
+    subarray_event = DL0_Subarray.Event(
+        trigger_type=1,
+        sb_id=sb_id,
+        obs_id=obs_id,
+        tel_ids=tel_ids,
+    )
+    tel_event = DL0_Telescope.Event(
+        tel_id=camera_configuration.tel_id,
+        event_type=EventType.SUBARRAY.value,
+        pixel_status=pixel_status,
+        waveform=waveform,
+        num_channels=1,
+        num_samples=40,
+        num_pixels_survived=1855,
+    )
 
     with ctx:
         trigger_file = ctx.enter_context(ProtobufZOFits(**proto_kwargs))
@@ -172,53 +298,43 @@ def dummy_dl0(dl0_base):
         # trigger_file.write_message(subarray_data_stream)
         trigger_file.move_to_new_table("SubarrayEvents")
 
+        # one writer thread per SDH so the files are compressed in parallel,
+        # a plain list indexed by position avoids dict hashing in the loop
+        queues = []
         for sdh_id in sdh_ids:
-            open_next_event_file(sdh_id)
-
-        for i in range(100):
+            queue = Queue()
+            thread = Thread(target=write_sdh_events, args=(sdh_id, queue))
+            ctx.callback(thread.join)
+            ctx.callback(queue.put, None)
+            thread.start()
+            queues.append(queue)
+
+        for i in range(n_events):
             event_id = i + 1
-            time_s, time_qns = time_to_cta_high_res(time)
-
-            trigger_file.write_message(
-                DL0_Subarray.Event(
-                    event_id=event_id,
-                    trigger_type=1,
-                    sb_id=sb_id,
-                    obs_id=obs_id,
-                    event_time_s=int(time_s),
-                    event_time_qns=int(time_qns),
-                    trigger_ids=to_anyarray(np.array([event_id])),
-                    tel_ids=to_anyarray(np.array([1])),
-                )
-            )
+            trigger_id[0] = event_id
+            time_s = int(times_s[i])
+            time_qns = int(times_qns[i])
 
-            sdh_id = sdh_ids[i % len(sdh_ids)]
-            # TODO: randomize event to test actually parsing it
-
-            # TODO: fill actual signal into waveform, not just 0
-            waveform = np.zeros((1, 1855, 40), dtype=np.float32)
-
-            lst_event_files[sdh_id].write_message(
-                DL0_Telescope.Event(
-                    event_id=event_id,
-                    tel_id=camera_configuration.tel_id,
-                    event_type=EventType.SUBARRAY.value,
-                    event_time_s=int(time_s),
-                    event_time_qns=int(time_qns),
-                    # identified as signal, low gain stored, high gain stored
-                    pixel_status=to_anyarray(np.full(1855, 0b00001101, dtype=np.uint8)),
-                    waveform=to_anyarray(convert_waveform(waveform)),
-                    num_channels=1,
-                    num_samples=40,
-                    num_pixels_survived=1855,
-                )
-            )
-            events_written[sdh_id] += 1
-            if events_written[sdh_id] >= chunksize:
-                open_next_event_file(sdh_id)
-
-            time = time + 0.001 * u.s
+            subarray_event.event_id = event_id
+            subarray_event.event_time_s = time_s
+            subarray_event.event_time_qns = time_qns
+            subarray_event.trigger_ids.CopyFrom(to_anyarray(trigger_id))
+            trigger_file.write_message(subarray_event)
 
+            # TODO: randomize event to test actually parsing it
+            tel_event.event_id = event_id
+            tel_event.event_time_s = time_s
+            tel_event.event_time_qns = time_qns
+            # the writer threads serialize asynchronously, hand them a copy
+            event = DL0_Telescope.Event()
+            event.CopyFrom(tel_event)
+            queues[i % len(queues)].put(event)
+
+    if write_errors:
+        raise write_errors[0]
+
+    # mark the cached files as complete only now, after all writers finished
+    done_marker.touch()
     return trigger_path
 
 
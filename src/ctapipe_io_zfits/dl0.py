@@ -1,6 +1,10 @@
 """DL0 Protozfits EventSource."""
 import logging
+import os
 from contextlib import ExitStack
+from pathlib import Path
+from queue import Empty, Full, Queue
+from threading import Event, Thread
 
 import numpy as np
 from ctapipe.containers import (
@@ -17,10 +21,8 @@ from ctapipe.containers import (
 from ctapipe.core.traits import Integer
 from ctapipe.instrument import SubarrayDescription
 from ctapipe.io import DataLevel, EventSource
-from ctapipe.io.simteleventsource import GainChannel
-from protozfits import File
 
-from .instrument import build_subarray_description, get_array_elements_by_id
+from .instrument import build_subarray_description
 from .multifile import MultiFiles
 from .time import cta_high_res_to_time
 
@@ -31,10 +33,167 @@ __all__ = [
 
 log = logging.getLogger(__name__)
 
-ARRAY_ELEMENTS = get_array_elements_by_id()
+#: EventType by raw value, a plain dict probe is much cheaper than the
+#: EnumMeta __call__ that ``EventType(value)`` goes through per event
+_EVENT_TYPE_BY_VALUE = {e.value: e for e in EventType}
+
+#: the PixelStatus helpers reduce to bitwise ops, uint8 constants keep
+#: the per-event masking in uint8 without IntFlag upcasts or extra calls
+_DVR_STATUS_MASK = np.uint8(PixelStatus.DVR_STATUS)
+_GAIN_BITS_MASK = np.uint8(PixelStatus.HIGH_GAIN_STORED | PixelStatus.LOW_GAIN_STORED)
+
+#: number of subarray trigger events decoded per batch in _generator,
+#: timestamps of a full batch are converted with one vectorized Time call
+TRIGGER_BATCH_SIZE = 1024
+
+#: number of telescope events decoded ahead per telescope, bounds the
+#: memory held by the prefetch threads
+TELESCOPE_PREFETCH_DEPTH = 8
+
+
+def _next_batch(iterator, n):
+    """Return up to ``n`` items from ``iterator`` without calling iter() on it."""
+    batch = []
+    try:
+        for _ in range(n):
+            batch.append(next(iterator))
+    except StopIteration:
+        pass
+    return batch
+
+
+def _queue_put(queue, item, stop):
+    """Put ``item`` into ``queue``, giving up when ``stop`` is set."""
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return
+        except Full:
+            pass
+
+
+#: results of _is_compatible keyed by (path, extname, mtime, size), the check
+#: is run once per file by EventSource.from_url before the source opens it again
+_compat_cache = {}
+
+
+class _TelescopeEventPrefetcher:
+    """Iterate a ``MultiFiles``, decoding ahead in a background thread.
+
+    Each telescope reads independent files, so one reader thread per
+    telescope overlaps decompression across telescopes and with the
+    consumer's container filling.
+    """
+
+    def __init__(self, multi_file):
+        self._multi_file = multi_file
+        self._queue = Queue(maxsize=TELESCOPE_PREFETCH_DEPTH)
+        self._stop = Event()
+        self._exhausted = False
+        self._thread = Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # metadata (camera_config, waveform scale / offset, ...) lives on
+        # the wrapped MultiFiles
+        return getattr(self._multi_file, name)
+
+    def _read(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    event = next(self._multi_file)
+                except StopIteration:
+                    break
+                _queue_put(self._queue, (event, None), self._stop)
+        except Exception as e:
+            _queue_put(self._queue, (None, e), self._stop)
+        else:
+            _queue_put(self._queue, (None, None), self._stop)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._exhausted:
+            raise StopIteration
+
+        event, error = self._queue.get()
+        if error is not None:
+            self._exhausted = True
+            raise error
+        if event is None:
+            self._exhausted = True
+            raise StopIteration
+        return event
+
+    def close(self):
+        """Stop the reader thread, then close the underlying files."""
+        self._stop.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except Empty:
+            pass
+        self._thread.join()
+        self._multi_file.close()
 
 
 def _is_compatible(input_url, extname, allowed_protos):
+    try:
+        stat = os.stat(input_url)
+    except OSError as e:
+        log.debug("Error trying to stat input file: %s", e)
+        return False
+
+    cache_key = (str(input_url), extname, stat.st_mtime_ns, stat.st_size)
+    try:
+        return _compat_cache[cache_key]
+    except KeyError:
+        pass
+
+    result = _check_compatible_fast(input_url, extname, allowed_protos)
+    if result is None:
+        result = _check_compatible(input_url, extname, allowed_protos)
+    _compat_cache[cache_key] = result
+    return result
+
+
+#: size of a FITS header / data block in bytes
+FITS_BLOCK_SIZE = 2880
+
+
+def _check_compatible_fast(input_url, extname, allowed_protos):
+    """Cheap compatibility check on the first few raw FITS header blocks.
+
+    Returns True / False if the file can be judged from the header bytes
+    alone and None if the full astropy-based check is needed.
+    """
+    try:
+        with open(input_url, "rb") as f:
+            header = f.read(10 * FITS_BLOCK_SIZE)
+    except OSError as e:
+        log.debug("Error trying to read start of input file: %s", e)
+        return None
+
+    # everything fits.open could parse has to start with this card
+    if not header.startswith(b"SIMPLE"):
+        log.debug("File does not start with a FITS SIMPLE card")
+        return False
+
+    # only a positive fast path: the wanted HDU may sit beyond the bytes
+    # read here, so absence of the markers is not proof of incompatibility
+    if (
+        f"'{extname}'".encode("ascii") in header
+        and b"ZTABLE" in header
+        and any(proto.encode("ascii") in header for proto in allowed_protos)
+    ):
+        return True
+
+    return None
+
+
+def _check_compatible(input_url, extname, allowed_protos):
     from astropy.io import fits
 
     # this allows us to just use try/except around the opening of the fits file,
@@ -42,7 +201,10 @@ def _is_compatible(input_url, extname, allowed_protos):
 
     with stack:
         try:
-            hdul = stack.enter_context(fits.open(input_url))
+            # only headers are needed, don't parse all HDUs or load any data
+            hdul = stack.enter_context(
+                fits.open(input_url, memmap=True, lazy_load_hdus=True)
+            )
         except Exception as e:
             log.debug("Error trying to open input file as fits: %s", e)
             return False
@@ -75,39 +237,68 @@ def _is_compatible(input_url, extname, allowed_protos):
 
 def _fill_dl0_container(
     tel_event,
-    data_stream,
+    inv_scale,
+    offset,
     camera_config,
     camera_geometry,
+    stored_index_cache,
+    identity_map=False,
+    event_time=None,
     ignore_samples_start=0,
     ignore_samples_end=0,
 ):
     n_channels = tel_event.num_channels
     n_pixels_stored = tel_event.num_pixels_survived
     n_samples = tel_event.num_samples
-    shape = (n_channels, n_pixels_stored, n_samples)
+    # gain-reduced data is reshaped straight to 2d, skipping the length-1
+    # gain axis and its selection further down
+    if n_channels == 1:
+        shape = (n_pixels_stored, n_samples)
+    else:
+        shape = (n_channels, n_pixels_stored, n_samples)
     waveform = tel_event.waveform.reshape(shape)
-    offset = data_stream.waveform_offset
-    scale = data_stream.waveform_scale
 
-    zfits_waveform = waveform.astype(np.float32) / scale - offset
+    # dequantize in-place on one float32 copy instead of allocating an
+    # intermediate array per operation, this is the per-event hot path
+    zfits_waveform = waveform.astype(np.float32)
+    np.multiply(zfits_waveform, inv_scale, out=zfits_waveform)
+    np.subtract(zfits_waveform, offset, out=zfits_waveform)
+
+    # read once, every protobuf attribute access is a descriptor call
+    zfits_pixel_status = tel_event.pixel_status
 
-    pixel_status = tel_event.pixel_status
+    pixel_status = zfits_pixel_status
     # FIXME: seems ACADA doesn't set pixels to "stored" when no DVR is applied
-    if n_pixels_stored == camera_config.num_pixels and np.all(
-        PixelStatus.get_dvr_status(pixel_status) == 0
+    if n_pixels_stored == camera_config.num_pixels and not np.any(
+        pixel_status & _DVR_STATUS_MASK
     ):
-        pixel_status = pixel_status | PixelStatus.DVR_STORED_AS_SIGNAL
+        pixel_status = pixel_status | np.uint8(PixelStatus.DVR_STORED_AS_SIGNAL)
 
-    pixel_stored = PixelStatus.get_dvr_status(pixel_status) != 0
+    pixel_stored = (pixel_status & _DVR_STATUS_MASK) != 0
     n_pixels_nominal = camera_geometry.n_pixels
 
     # fill not readout pixels with 0, reorder pixels, use 2d array when gain reduced
-    if n_channels == 2:
-        waveform = np.zeros((n_channels, n_pixels_nominal, n_samples), dtype=np.float32)
-        waveform[:, camera_config.pixel_id_map[pixel_stored]] = zfits_waveform
+    if identity_map and n_pixels_stored == n_pixels_nominal:
+        # all pixels stored in nominal order, the dequantized copy
+        # already is the output, no scatter needed
+        waveform = zfits_waveform
     else:
-        waveform = np.zeros((n_pixels_nominal, n_samples), dtype=np.float32)
-        waveform[camera_config.pixel_id_map[pixel_stored]] = zfits_waveform[0]
+        # the stored-pixel set repeats over many events, cache the scatter
+        # index instead of rebuilding the boolean gather per event
+        key = pixel_stored.tobytes()
+        stored_index = stored_index_cache.get(key)
+        if stored_index is None:
+            stored_index = camera_config.pixel_id_map[pixel_stored]
+            stored_index_cache[key] = stored_index
+
+        if n_channels == 2:
+            waveform = np.zeros(
+                (n_channels, n_pixels_nominal, n_samples), dtype=np.float32
+            )
+            waveform[:, stored_index] = zfits_waveform
+        else:
+            waveform = np.zeros((n_pixels_nominal, n_samples), dtype=np.float32)
+            waveform[stored_index] = zfits_waveform
 
     if ignore_samples_start != 0 or ignore_samples_end != 0:
         start = ignore_samples_start
@@ -115,27 +306,36 @@ def _fill_dl0_container(
         waveform = waveform[..., start:end]
 
     # reorder to nominal pixel order
-    pixel_status = np.zeros(n_pixels_nominal, dtype=tel_event.pixel_status.dtype)
+    pixel_status = np.zeros(n_pixels_nominal, dtype=zfits_pixel_status.dtype)
     pixel_status[camera_config.pixel_id_map] = pixel_status
 
-    channel_info = PixelStatus.get_channel_info(pixel_status)
+    channel_info = (pixel_status & _GAIN_BITS_MASK) >> 2
     if n_channels == 1:
-        selected_gain_channel = np.where(
-            channel_info == PixelStatus.HIGH_GAIN_STORED,
-            GainChannel.HIGH,
-            GainChannel.LOW,
+        # GainChannel.HIGH is 0 and LOW is 1, so the comparison already
+        # is the selected channel, no need for np.where
+        selected_gain_channel = (channel_info != PixelStatus.HIGH_GAIN_STORED).astype(
+            np.int8
         )
     else:
         selected_gain_channel = None
 
-    return DL0CameraContainer(
-        pixel_status=tel_event.pixel_status,
-        event_type=EventType(tel_event.event_type),
-        selected_gain_channel=selected_gain_channel,
-        event_time=cta_high_res_to_time(
+    event_type = _EVENT_TYPE_BY_VALUE.get(tel_event.event_type)
+    if event_type is None:
+        event_type = EventType(tel_event.event_type)
+
+    # Time construction is expensive, callers that already converted the
+    # timestamp pass it in
+    if event_time is None:
+        event_time = cta_high_res_to_time(
             tel_event.event_time_s,
             tel_event.event_time_qns,
-        ),
+        )
+
+    return DL0CameraContainer(
+        pixel_status=zfits_pixel_status,
+        event_type=event_type,
+        selected_gain_channel=selected_gain_channel,
+        event_time=event_time,
         waveform=waveform,
         first_cell_id=tel_event.first_cell_id,
     )
@@ -153,6 +353,9 @@ class ProtozfitsDL0EventSource(EventSource):
     subarray_id = Integer(default_value=1).tag(config=True)
 
     def __init__(self, input_url=None, **kwargs):
+        # deferred, protozfits is only needed once a source is constructed
+        from protozfits import File
+
         if input_url is not None:
             kwargs["input_url"] = input_url
 
@@ -175,30 +378,33 @@ class ProtozfitsDL0EventSource(EventSource):
 
         self._subarray = build_subarray_description(self.subarray_id)
 
+        obs_id_u64 = np.uint64(self.obs_id)
+        sb_id_u64 = np.uint64(self.sb_id)
         self._observation_blocks = {
-            self.obs_id: ObservationBlockContainer(
-                obs_id=np.uint64(self.obs_id), sb_id=np.uint64(self.sb_id)
-            )
+            self.obs_id: ObservationBlockContainer(obs_id=obs_id_u64, sb_id=sb_id_u64)
         }
         self._scheduling_blocks = {
-            self.sb_id: SchedulingBlockContainer(sb_id=np.uint64(self.sb_id))
+            self.sb_id: SchedulingBlockContainer(sb_id=sb_id_u64)
         }
 
+        # the same telescope combination repeats over thousands of events,
+        # cache the converted id lists keyed by the raw array bytes
+        self._tel_ids_cache = {}
+
         # <prefix>/DL0/<ae-id>/<acada-user>/acada-adh/events/<YYYY>/<MM>/<DD>/
         self._dl0_base = self.input_url.parents[7]
         self._acada_user = self.input_url.parents[5].name
         self._date_dirs = self.input_url.parent.relative_to(self.input_url.parents[3])
+        # everything below the telescope directory is the same for all
+        # telescopes, join it once instead of per telescope
+        self._tel_events_suffix = (
+            Path(self._acada_user) / "acada-adh/events" / self._date_dirs
+        )
 
         self._open_telescope_files()
 
     def _get_tel_events_directory(self, tel_id):
-        return (
-            self._dl0_base
-            / f"TEL{tel_id:03d}"
-            / self._acada_user
-            / "acada-adh/events"
-            / self._date_dirs
-        )
+        return self._dl0_base / f"TEL{tel_id:03d}" / self._tel_events_suffix
 
     @staticmethod
     def is_compatible(file_path):
@@ -215,17 +421,18 @@ class ProtozfitsDL0EventSource(EventSource):
             # get the directory, where we should look for files
             tel_dir = self._get_tel_events_directory(tel_id)
 
-            try:
-                first_file = sorted(
-                    tel_dir.glob(f"*_SBID*{self.sb_id}_OBSID*{self.obs_id}*.fits.fz")
-                )[0]
-            except IndexError:
+            # min is O(N) and avoids materializing the sorted list of chunks
+            first_file = min(
+                tel_dir.glob(f"*_SBID*{self.sb_id}_OBSID*{self.obs_id}*.fits.fz"),
+                default=None,
+            )
+            if first_file is None:
                 self.log.warning("No events file found for tel_id %d", tel_id)
                 continue
 
-            self._telescope_files[tel_id] = self._exit_stack.enter_context(
-                MultiFiles(first_file, parent=self)
-            )
+            prefetcher = _TelescopeEventPrefetcher(MultiFiles(first_file, parent=self))
+            self._exit_stack.callback(prefetcher.close)
+            self._telescope_files[tel_id] = prefetcher
 
     def close(self):
         """Close underlying files."""
@@ -254,41 +461,99 @@ class ProtozfitsDL0EventSource(EventSource):
     def scheduling_blocks(self) -> dict[int, SchedulingBlockContainer]:  # noqa: D102
         return self._scheduling_blocks
 
+    def _read_trigger_batches(self, queue, stop):
+        """Prefetch and decode trigger batches in a background thread."""
+        # protozfits Tables restart iteration on each iter() call, so consume
+        # the table with explicit next() instead of itertools.islice
+        events = iter(self._subarray_trigger_file.SubarrayEvents)
+        try:
+            while not stop.is_set():
+                batch = _next_batch(events, TRIGGER_BATCH_SIZE)
+                if not batch:
+                    break
+                # scalar Time construction is expensive, convert whole batches
+                times = cta_high_res_to_time(
+                    np.array([e.event_time_s for e in batch]),
+                    np.array([e.event_time_qns for e in batch]),
+                )
+                _queue_put(queue, (batch, times, None), stop)
+        except Exception as e:
+            _queue_put(queue, (None, None, e), stop)
+        else:
+            _queue_put(queue, (None, None, None), stop)
+
     def _generator(self):
-        for count, subarray_trigger in enumerate(
-            self._subarray_trigger_file.SubarrayEvents
-        ):
-            array_event = ArrayEventContainer(
-                count=count,
-                index=EventIndexContainer(
-                    obs_id=subarray_trigger.obs_id, event_id=subarray_trigger.event_id
-                ),
-                trigger=TriggerContainer(
-                    time=cta_high_res_to_time(
-                        subarray_trigger.event_time_s, subarray_trigger.event_time_qns
-                    ),
-                    tels_with_trigger=subarray_trigger.tel_ids.tolist(),
-                ),
-            )
+        # decode ahead in a background thread, the double-buffered queue
+        # overlaps decompression with the consumer's per-event work
+        queue = Queue(maxsize=2)
+        stop = Event()
+        reader = Thread(
+            target=self._read_trigger_batches, args=(queue, stop), daemon=True
+        )
+        reader.start()
 
-            for tel_id in array_event.trigger.tels_with_trigger:
-                tel_file = self._telescope_files[tel_id]
-                tel_event = next(tel_file)
-                if tel_event.event_id != array_event.index.event_id:
-                    raise ValueError(
-                        f"Telescope event for tel_id {tel_id} has different event id!"
-                        f" event_id of subarray event: {array_event.index.event_id}"
-                        f" event_id of telescope event: {tel_event.event_id}"
-                    )
-
-                array_event.dl0.tel[tel_id] = _fill_dl0_container(
-                    tel_event,
-                    tel_file.data_stream,
-                    tel_file.camera_config,
-                    self.subarray.tel[tel_id].camera.geometry,
+        count = 0
+        try:
+            while True:
+                batch, times, error = queue.get()
+                if error is not None:
+                    raise error
+                if batch is None:
+                    break
+
+                for i, subarray_trigger in enumerate(batch):
+                    yield self._fill_array_event(count, subarray_trigger, times[i])
+                    count += 1
+        finally:
+            stop.set()
+            # unblock the reader in case it is waiting to put a batch
+            try:
+                while True:
+                    queue.get_nowait()
+            except Empty:
+                pass
+            reader.join()
+
+    def _fill_array_event(self, count, subarray_trigger, time):
+        key = subarray_trigger.tel_ids.tobytes()
+        tels_with_trigger = self._tel_ids_cache.get(key)
+        if tels_with_trigger is None:
+            tels_with_trigger = subarray_trigger.tel_ids.tolist()
+            self._tel_ids_cache[key] = tels_with_trigger
+
+        event_id = subarray_trigger.event_id
+        array_event = ArrayEventContainer(
+            count=count,
+            index=EventIndexContainer(
+                obs_id=subarray_trigger.obs_id, event_id=event_id
+            ),
+            trigger=TriggerContainer(
+                time=time,
+                tels_with_trigger=tels_with_trigger,
+            ),
+        )
+
+        for tel_id in tels_with_trigger:
+            tel_file = self._telescope_files[tel_id]
+            tel_event = next(tel_file)
+            if tel_event.event_id != event_id:
+                raise ValueError(
+                    f"Telescope event for tel_id {tel_id} has different event id!"
+                    f" event_id of subarray event: {event_id}"
+                    f" event_id of telescope event: {tel_event.event_id}"
                 )
 
-            yield array_event
+            array_event.dl0.tel[tel_id] = _fill_dl0_container(
+                tel_event,
+                tel_file.waveform_inv_scale,
+                tel_file.waveform_offset,
+                tel_file.camera_config,
+                self.subarray.tel[tel_id].camera.geometry,
+                tel_file.stored_index_cache,
+                identity_map=tel_file.pixel_id_map_identity,
+            )
+
+        return array_event
 
 
 class ProtozfitsDL0TelescopeEventSource(EventSource):
@@ -321,20 +586,23 @@ class ProtozfitsDL0TelescopeEventSource(EventSource):
         self._exit_stack = ExitStack()
         self._subarray = build_subarray_description(self.subarray_id)
 
-        self._multi_file = self._exit_stack.enter_context(
+        # decode ahead in a background thread, like the per-telescope
+        # streams of the subarray source
+        self._multi_file = _TelescopeEventPrefetcher(
             MultiFiles(self.input_url, parent=self)
         )
+        self._exit_stack.callback(self._multi_file.close)
         self.sb_id = self._multi_file.data_stream.sb_id
         self.obs_id = self._multi_file.data_stream.obs_id
         self.tel_id = self._multi_file.data_stream.tel_id
 
+        obs_id_u64 = np.uint64(self.obs_id)
+        sb_id_u64 = np.uint64(self.sb_id)
         self._observation_blocks = {
-            self.obs_id: ObservationBlockContainer(
-                obs_id=np.uint64(self.obs_id), sb_id=np.uint64(self.sb_id)
-            )
+            self.obs_id: ObservationBlockContainer(obs_id=obs_id_u64, sb_id=sb_id_u64)
         }
         self._scheduling_blocks = {
-            self.sb_id: SchedulingBlockContainer(sb_id=np.uint64(self.sb_id))
+            self.sb_id: SchedulingBlockContainer(sb_id=sb_id_u64)
         }
 
     def close(self):  # noqa: D102
@@ -370,6 +638,9 @@ class ProtozfitsDL0TelescopeEventSource(EventSource):
         time = cta_high_res_to_time(
             zfits_event.event_time_s, zfits_event.event_time_qns
         )
+        event_type = _EVENT_TYPE_BY_VALUE.get(zfits_event.event_type)
+        if event_type is None:
+            event_type = EventType(int(zfits_event.event_type))
         array_event = ArrayEventContainer(
             count=count,
             index=EventIndexContainer(
@@ -378,16 +649,20 @@ class ProtozfitsDL0TelescopeEventSource(EventSource):
             ),
             trigger=TriggerContainer(
                 tels_with_trigger=[self.tel_id],
-                event_type=EventType(int(zfits_event.event_type)),
+                event_type=event_type,
                 time=time,
             ),
         )
         array_event.trigger.tel[tel_id] = TelescopeTriggerContainer(time=time)
         array_event.dl0.tel[tel_id] = _fill_dl0_container(
             zfits_event,
-            self._multi_file.data_stream,
+            self._multi_file.waveform_inv_scale,
+            self._multi_file.waveform_offset,
             self._multi_file.camera_config,
             self.subarray.tel[tel_id].camera.geometry,
+            self._multi_file.stored_index_cache,
+            identity_map=self._multi_file.pixel_id_map_identity,
+            event_time=time,
             ignore_samples_start=self.ignore_samples_start,
             ignore_samples_end=self.ignore_samples_end,
         )
@@ -79,8 +79,30 @@ def get_array_element_ids(subarray_id: int) -> tuple[int]:
     return tuple(subarray["array_element_ids"])
 
 
+@cache
+def _load_lst_camera_description():
+    """Load LSTCam, read only once and shared by all LSTs of a subarray."""
+    optics = OPTICS["LST"]
+
+    with as_file(RESOURCES / "LSTCam.camgeom.fits.gz") as path:
+        Provenance().add_input_file(path, "CameraGeometry")
+        geometry = CameraGeometry.from_table(path)
+        geometry.frame = CameraFrame(focal_length=optics.effective_focal_length)
+
+    with as_file(RESOURCES / "LSTCam.camreadout.fits.gz") as path:
+        Provenance().add_input_file(path, "CameraReadout")
+        readout = CameraReadout.from_table(path)
+
+    return CameraDescription("LSTCam", geometry=geometry, readout=readout)
+
+
+@cache
 def build_subarray_description(subarray_id):
-    """Create a SubarrayDescription from the subarray_id."""
+    """Create a SubarrayDescription from the subarray_id.
+
+    The result is cached and shared between event sources, it must not
+    be modified in-place.
+    """
     try:
         subarray = get_subarrays_by_id()[subarray_id]
     except KeyError:
@@ -95,17 +117,7 @@ def build_subarray_description(subarray_id):
 
         if name.startswith("LST"):
             optics = OPTICS["LST"]
-
-            with as_file(RESOURCES / "LSTCam.camgeom.fits.gz") as path:
-                Provenance().add_input_file(path, "CameraGeometry")
-                geometry = CameraGeometry.from_table(path)
-                geometry.frame = CameraFrame(focal_length=optics.effective_focal_length)
-
-            with as_file(RESOURCES / "LSTCam.camreadout.fits.gz") as path:
-                Provenance().add_input_file(path, "CameraReadout")
-                readout = CameraReadout.from_table(path)
-
-            camera = CameraDescription("LSTCam", geometry=geometry, readout=readout)
+            camera = _load_lst_camera_description()
         else:
             raise ValueError("Only LSTs supported at the moment")
 
@@ -1,29 +1,35 @@
 """Load multiple stream files in parallel and iterate over events in order."""
+import os
 import re
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from heapq import heappop, heappush
+from itertools import count
 from pathlib import Path
-from queue import Empty, PriorityQueue
 from typing import Any
 
+import numpy as np
 from ctapipe.core import Component, Provenance
 from ctapipe.core.traits import Bool, CaselessStrEnum
-from protozfits import File
 
 __all__ = [
     "MultiFiles",
 ]
 
 
-@dataclass(order=True)
-class NextEvent:
-    """Class to get sorted access to events from multiple files."""
+@dataclass(slots=True)
+class _SourceState:
+    """Reader state of one data source, replaces parallel per-source dicts."""
 
-    priority: int
-    event: Any = field(compare=False)
-    data_source: str = field(compare=False)
+    data_source: str
+    chunk: int
+    file: Any = None
+    table: Any = None
+    header: Any = None
 
 
-@dataclass()
+@dataclass(slots=True)
 class FileInfo:
     tel_id: int
     data_source: str
@@ -40,14 +46,16 @@ filename_conventions = {
     # Tel001_SDH_3001_20231003T204445_sbid2000000008_obid2000000016_9.fits.fz
     "acada_rel1": {
         "re": re.compile(
-            r"Tel(?P<tel_id>\d+)_(?P<data_source>SDH_\d+)_(?P<timestamp>\d{8}T\d{6})_sbid(?P<sb_id>\d+)_obid(?P<obs_id>\d+)_(?P<chunk>\d+)\.fits\.fz"  # noqa
+            r"Tel(?P<tel_id>\d+)_(?P<data_source>SDH_\d+)_(?P<timestamp>\d{8}T\d{6})_sbid(?P<sb_id>\d+)_obid(?P<obs_id>\d+)_(?P<chunk>\d+)\.fits\.fz",  # noqa
+            re.ASCII,
         ),
         "template": "Tel{tel_id:03d}_{data_source}_{timestamp}_sbid{sb_id:0{sb_id_padding}d}_obid{obs_id:0{obs_id_padding}d}_{chunk:0{chunk_padding}d}.fits.fz",  # noqa
     },
     "acada_dpps_icd": {
         # TEL001_SDH0001_20231013T220427_SBID0000000002000000013_OBSID0000000002000000027_CHUNK000.fits.fz
         "re": re.compile(
-            r"TEL(?P<tel_id>\d+)_(?P<data_source>SDH\d+)_(?P<timestamp>\d{8}T\d{6})_SBID(?P<sb_id>\d+)_OBSID(?P<obs_id>\d+)(?P<data_type>_[a-zA-Z0-9_]+)?_CHUNK(?P<chunk>\d+)\.fits\.fz"  # noqa
+            r"TEL(?P<tel_id>\d+)_(?P<data_source>SDH\d+)_(?P<timestamp>\d{8}T\d{6})_SBID(?P<sb_id>\d+)_OBSID(?P<obs_id>\d+)(?P<data_type>_[a-zA-Z0-9_]+)?_CHUNK(?P<chunk>\d+)\.fits\.fz",  # noqa
+            re.ASCII,
         ),
         "template": "TEL{tel_id:03d}_{data_source}_{timestamp}_SBID{sb_id:0{sb_id_padding}d}_OBSID{obs_id:0{obs_id_padding}d}{data_type}_CHUNK{chunk:0{chunk_padding}d}.fits.fz",  # noqa
     },
@@ -55,13 +63,17 @@ filename_conventions = {
 
 
 def get_file_info(path, convention):
-    path = Path(path)
+    # cached per name, the same files are parsed again by higher layers
+    return _get_file_info(Path(path).name, convention)
 
+
+@lru_cache(maxsize=4096)
+def _get_file_info(name, convention):
     regex = filename_conventions[convention]["re"]
-    m = regex.match(path.name)
+    m = regex.match(name)
     if m is None:
         raise ValueError(
-            f"Filename {path.name} did not match convention"
+            f"Filename {name} did not match convention"
             f" {convention} with regex {regex}"
         )
 
@@ -132,54 +144,91 @@ class MultiFiles(Component):
 
         file_info = get_file_info(path, convention=self.filename_convention)
         self.directory = self.path.parent
-        self.filename_template = filename_conventions[self.filename_convention][
-            "template"
-        ]
+        convention = filename_conventions[self.filename_convention]
+        self.filename_template = convention["template"]
+        self._filename_regex = convention["re"]
 
+        self._first_file_info = file_info
         # figure out how many data sources we have:
-        data_source_pattern = self.filename_template.format(
-            tel_id=file_info.tel_id,
-            data_source="*",
-            timestamp="*",
-            sb_id=file_info.sb_id,
-            obs_id=file_info.obs_id,
-            chunk=file_info.chunk,
-            data_type=file_info.data_type,
-            sb_id_padding=file_info.sb_id_padding,
-            obs_id_padding=file_info.obs_id_padding,
-            chunk_padding=file_info.chunk_padding,
-        )
-
-        self.log.debug(
-            "Looking for parallel data source using pattern: %s", data_source_pattern
-        )
-        paths = sorted(self.directory.glob(data_source_pattern))
-        self.log.debug("Found %d matching paths: %s", len(paths), paths)
+        self._scan_directory()
         self.data_sources = {
-            get_file_info(path, convention=self.filename_convention).data_source
-            for path in paths
+            data_source
+            for data_source, chunk in self._chunk_index
+            if chunk == file_info.chunk
         }
         self.log.debug("Found the following data sources: %s", self.data_sources)
 
-        self._current_chunk = {
-            data_source: file_info.chunk - 1 for data_source in self.data_sources
+        self._sources = {
+            data_source: _SourceState(data_source, file_info.chunk - 1)
+            for data_source in self.data_sources
         }
-        self._open_files = {}
 
-        self._first_file_info = file_info
-        self._events = PriorityQueue()
-        self._events_tables = {}
-        self._events_headers = {}
+        # min-heap of (event_id, tiebreaker, event, source state), iteration
+        # is single threaded so a plain heapq beats PriorityQueue's locking
+        self._events = []
+        self._counter = count()
         self.camera_config = None
         self.data_stream = None
+        self.waveform_inv_scale = None
+        self.waveform_offset = None
+        # scatter indices into nominal pixel order, keyed by the raw
+        # stored-pixel mask, see _fill_dl0_container
+        self.stored_index_cache = {}
+        self.pixel_id_map_identity = False
+
+        # chunk files opened ahead of time, keyed by path
+        self._prefetched = {}
+        self._executor = None
+        if len(self.data_sources) > 0:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.data_sources))
+
+        # start opening all first chunks concurrently, the serial loop below
+        # then only picks up the already running opens
+        for data_source in self.data_sources:
+            self._prefetch_chunk(data_source, file_info.chunk)
 
         for data_source in self.data_sources:
             self._load_next_chunk(data_source)
 
+    def _scan_directory(self):
+        """Index the chunk files of this run by (data_source, chunk).
+
+        One directory scan replaces a glob per chunk advance per data
+        source; `_load_next_chunk` rescans when a chunk is missing, so
+        files appearing while we read are still picked up.
+        """
+        info = self._first_file_info
+        index = {}
+        # scandir avoids fnmatch and a Path object per entry, only
+        # matching names are turned into paths below
+        with os.scandir(self.directory) as entries:
+            names = sorted(entry.name for entry in entries)
+
+        for name in names:
+            m = self._filename_regex.match(name)
+            if m is None:
+                continue
+
+            groups = m.groupdict()
+            if (
+                int(groups["tel_id"]) != info.tel_id
+                or int(groups["sb_id"]) != info.sb_id
+                or int(groups["obs_id"]) != info.obs_id
+                or (groups.get("data_type") or "") != info.data_type
+            ):
+                continue
+
+            # currently there is a timing issue between acada / EVB resulting
+            # in two files with chunk000, the first file technically has the
+            # last events of the previous ob, sorted iteration keeps the last
+            index[groups["data_source"], int(groups["chunk"])] = self.directory / name
+
+        self._chunk_index = index
+
     @property
     def n_open_files(self):
         """Number of currently open files."""
-        return len(self._open_files)
+        return sum(state.file is not None for state in self._sources.values())
 
     def _load_next_chunk(self, data_source):
         """Open the next (or first) subrun.
@@ -189,57 +238,98 @@ class MultiFiles(Component):
         stream : int or None
             If None, assume the single-file case and just open it.
         """
-        if data_source in self._open_files:
-            self._open_files.pop(data_source).close()
-
-        self._current_chunk[data_source] += 1
-        chunk = self._current_chunk[data_source]
-
-        pattern = self.filename_template.format(
-            tel_id=self._first_file_info.tel_id,
-            data_source=data_source,
-            timestamp="*",
-            sb_id=self._first_file_info.sb_id,
-            obs_id=self._first_file_info.obs_id,
-            data_type=self._first_file_info.data_type,
-            chunk=chunk,
-            sb_id_padding=self._first_file_info.sb_id_padding,
-            obs_id_padding=self._first_file_info.obs_id_padding,
-            chunk_padding=self._first_file_info.chunk_padding,
-        )
-        try:
-            # currently there is a timing issue between acada / EVB resulting
-            # in two files with chunk000, the first file technically has the last
-            # events of the previous ob, so we sort and take the last entry
-            path = sorted(self.directory.glob(pattern))[-1]
-        except IndexError:
+        # deferred, protozfits is only needed once files are opened
+        from protozfits import File
+
+        state = self._sources[data_source]
+        if state.file is not None:
+            state.file.close()
+            state.file = None
+
+        state.chunk += 1
+        chunk = state.chunk
+
+        path = self._chunk_index.get((data_source, chunk))
+        if path is None:
+            # the chunk may have been written after the last scan
+            self._scan_directory()
+            path = self._chunk_index.get((data_source, chunk))
+        if path is None:
             raise FileNotFoundError(
-                f"No file found for pattern {self.directory}/{pattern}"
-            ) from None
-
-        Provenance().add_input_file(str(path), "DL0")
-        self.log.info("Opening file %s", path)
-        file_ = File(str(path), pure_protobuf=self.pure_protobuf)
-        self._open_files[data_source] = file_
-
-        events_table = file_.Events
-        self._events_tables[data_source] = events_table
-        self._events_headers[data_source] = events_table.header
+                f"No file found for data_source {data_source}, chunk {chunk}"
+                f" in {self.directory}"
+            )
+
+        path_str = str(path)
+        Provenance().add_input_file(path_str, "DL0")
+        self.log.info("Opening file %s", path_str)
+        future = self._prefetched.pop(path, None)
+        if future is not None:
+            file_ = future.result()
+        else:
+            file_ = File(path_str, pure_protobuf=self.pure_protobuf)
+        state.file = file_
+
+        # open the following chunk in the background so crossing the chunk
+        # boundary does not stall on the file open
+        if self.all_chunks:
+            self._prefetch_chunk(data_source, chunk + 1)
+
+        state.table = file_.Events
+        state.header = state.table.header
 
         # load first event from each stream
-        event = next(events_table)
-        self._events.put_nowait(NextEvent(event.event_id, event, data_source))
+        event = next(state.table)
+        heappush(self._events, (event.event_id, next(self._counter), event, state))
 
         if self.data_stream is None:
             self.data_stream = file_.DataStream[0]
+            # cache the dequantization constants as plain float32 scalars,
+            # reading them off the protobuf message costs a descriptor call
+            # per event otherwise
+            self.waveform_inv_scale = np.float32(1 / self.data_stream.waveform_scale)
+            self.waveform_offset = np.float32(self.data_stream.waveform_offset)
 
         if self.camera_config is None:
             self.camera_config = file_.CameraConfiguration[0]
+            # a trivial map lets _fill_dl0_container skip the reordering
+            # scatter for fully stored events
+            self.pixel_id_map_identity = np.array_equal(
+                self.camera_config.pixel_id_map,
+                np.arange(self.camera_config.num_pixels),
+            )
+
+    def _prefetch_chunk(self, data_source, chunk):
+        """Open the given chunk in the background if it is already on disk."""
+        if self._executor is None:
+            return
+
+        path = self._chunk_index.get((data_source, chunk))
+        if path is None or path in self._prefetched:
+            return
+
+        from protozfits import File
+
+        self._prefetched[path] = self._executor.submit(
+            File, str(path), pure_protobuf=self.pure_protobuf
+        )
 
     def close(self):
         """Close the underlying files."""
-        for f in self._open_files.values():
-            f.close()
+        for state in self._sources.values():
+            if state.file is not None:
+                state.file.close()
+                state.file = None
+
+        for future in self._prefetched.values():
+            try:
+                future.result().close()
+            except Exception as e:
+                self.log.debug("Error closing prefetched file: %s", e)
+        self._prefetched.clear()
+
+        if self._executor is not None:
+            self._executor.shutdown()
 
     def __enter__(self):  # noqa: D105
         return self
@@ -255,21 +345,15 @@ class MultiFiles(Component):
         if not self._events:
             raise StopIteration
 
-        try:
-            next_event = self._events.get_nowait()
-        except Empty:
-            raise StopIteration from None
-
-        data_source = next_event.data_source
-        event = next_event.event
+        _, _, event, state = heappop(self._events)
 
         try:
-            new = next(self._events_tables[data_source])
-            self._events.put_nowait(NextEvent(new.event_id, new, data_source))
+            new = next(state.table)
+            heappush(self._events, (new.event_id, next(self._counter), new, state))
         except StopIteration:
             if self.all_chunks:
                 try:
-                    self._load_next_chunk(data_source)
+                    self._load_next_chunk(state.data_source)
                 except FileNotFoundError:
                     pass
 
@@ -2,10 +2,11 @@
 import re
 from dataclasses import dataclass
 from datetime import date, datetime
+from functools import lru_cache
 from pathlib import Path
 
 
-@dataclass
+@dataclass(slots=True)
 class FileNameInfo:
     """Components of a filename."""
 
@@ -35,36 +36,68 @@ FILENAME_RE = re.compile(
     r"(?:_(?P<subtype>SHOWER|CAL|MUON))?"
     r"(?:_CHUNK(?P<chunk_id>\d+))?"
     r"(?:_FILE(?P<file_id>\d+))?"
-    r"(?P<suffix>[.].*)?"
+    r"(?P<suffix>[.].*)?",
+    # filenames are ASCII per the ICD, skip the unicode digit tables
+    re.ASCII,
 )
 
 
 def parse_filename(path):
-    """Extract components from a path."""
-    name = Path(path).name
+    """Extract components from a path.
 
+    Results are cached per file name, the returned ``FileNameInfo`` is
+    shared between callers and must not be mutated.
+    """
+    return _parse_name(Path(path).name)
+
+
+@lru_cache(maxsize=4096)
+def _parse_name(name):
     match = FILENAME_RE.match(name)
     if not match:
         raise ValueError(f"File {name} does not match pattern: {FILENAME_RE}")
 
-    info = match.groupdict()
-
-    for key in (
-        "ae_id",
-        "subarray_id",
-        "sb_id",
-        "obs_id",
-        "chunk_id",
-        "file_id",
-    ):
-        info[key] = int(info[key]) if info[key] is not None else None
+    # access groups directly, groupdict() plus a conversion loop builds
+    # and rewrites a whole dict per filename
+    group = match.group
+    date_str = group("date")
+    time_str = group("time")
 
-    date = info.pop("date")
-    time = info.pop("time")
-
-    if time:
-        info["timestamp"] = datetime.strptime(f"{date}T{time}", "%Y%m%dT%H%M%S")
+    # the regex already guarantees all-digit fields of fixed length,
+    # direct int slicing avoids strptime's format parsing per call
+    year = int(date_str[:4])
+    month = int(date_str[4:6])
+    day = int(date_str[6:8])
+    if time_str:
+        timestamp = datetime(
+            year,
+            month,
+            day,
+            int(time_str[:2]),
+            int(time_str[2:4]),
+            int(time_str[4:6]),
+        )
     else:
-        info["timestamp"] = datetime.strptime(date, "%Y%m%d").date()
+        timestamp = date(year, month, day)
+
+    ae_id = group("ae_id")
+    subarray_id = group("subarray_id")
+    sb_id = group("sb_id")
+    obs_id = group("obs_id")
+    chunk_id = group("chunk_id")
+    file_id = group("file_id")
 
-    return FileNameInfo(**info)
+    return FileNameInfo(
+        data_source_id=group("data_source_id"),
+        ae_type=group("ae_type"),
+        ae_id=int(ae_id) if ae_id is not None else None,
+        subarray_id=int(subarray_id) if subarray_id is not None else None,
+        sb_id=int(sb_id) if sb_id is not None else None,
+        obs_id=int(obs_id) if obs_id is not None else None,
+        type_=group("type_"),
+        subtype=group("subtype"),
+        chunk_id=int(chunk_id) if chunk_id is not None else None,
+        file_id=int(file_id) if file_id is not None else None,
+        suffix=group("suffix"),
+        timestamp=timestamp,
+    )
@@ -6,7 +6,7 @@ from ctapipe_io_zfits.paths import FileNameInfo, parse_filename
 
 timestamp = datetime(2023, 10, 11, 3, 1, 5)
 
-icd_examples = [
+icd_examples = (
     # 1 <sub_id><swat_id><sb_id><obs_id>SUB.fits.fz
     (
         "SUB001_SWAT001_20231011T030105_SBID0000000000000012345_OBSID0000000000000006789_SUBARRAY_CHUNK000.fits.fz",  # noqa
@@ -520,7 +520,7 @@ icd_examples = [
             suffix=".fits",
         ),
     ),
-]
+)
 
 
 @pytest.mark.parametrize(("filename", "expected"), icd_examples)
@@ -30,7 +30,11 @@ def to_seconds(days):
 
 
 def time_to_cta_high_res(time):
-    """Convert astropy Time to cta high precision timestamp."""
+    """Convert astropy Time to cta high precision timestamp.
+
+    Works on scalar and array ``Time`` values alike, conversion of many
+    timestamps should be done in one call instead of a python loop.
+    """
     # make sure we are in TAI
     time = time.tai
 